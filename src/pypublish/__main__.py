@@ -1,141 +1,359 @@
 #!/usr/bin/env python3
+import glob
 import os
+import pathlib
+import shutil
 import sys
-import subprocess
-import argparse
 
-def run_command(command):
-    """Execute a shell command and return the exit code"""
-    process = subprocess.run(command, shell=True, check=True)
-    return process.returncode
+# Per-step timeouts (seconds): generous enough for slow networks, but
+# a hung child should never block a release indefinitely
+GIT_LOCAL_TIMEOUT = 5
+GIT_PUSH_TIMEOUT = 60
+BUILD_TIMEOUT = 600
+UPLOAD_TIMEOUT = 300
+
+def _vtag(version):
+    """Normalize a version string to its v-prefixed tag form"""
+    return version if version.startswith('v') else f'v{version}'
+
+def _log(message):
+    """Queue a log line on stderr without forcing an immediate flush"""
+    sys.stderr.write(message + "\n")
+
+def _die(message):
+    """Report a terminal failure and exit without interpreter shutdown.
+
+    os._exit skips atexit handlers and finalizer work; nothing in this
+    module holds a resource that needs cleanup once a child command
+    has already failed.
+    """
+    sys.stderr.write(message + "\n")
+    sys.stderr.flush()
+    os._exit(1)
+
+def _git_env():
+    """Environment for git network calls: reuse SSH connections and
+    error out stalled transfers"""
+    env = dict(os.environ)
+    # Multiplex SSH over a persistent control socket so repeated
+    # pushes (republish loops, CI matrices) skip the 100-500ms
+    # handshake; a user-provided GIT_SSH_COMMAND always wins. The
+    # socket lives in a user-private directory (never world-writable
+    # /tmp, which could be squatted) and %C hashes the connection
+    # details into the name
+    if os.name == 'posix':
+        socket_dir = os.environ.get('XDG_RUNTIME_DIR')
+        if not socket_dir:
+            socket_dir = os.path.join(os.path.expanduser('~'), '.ssh')
+            os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        env.setdefault(
+            'GIT_SSH_COMMAND',
+            'ssh -o ControlMaster=auto'
+            f' -o ControlPath={socket_dir}/pypublish-%C'
+            ' -o ControlPersist=60s')
+    env.setdefault('GIT_HTTP_LOW_SPEED_LIMIT', '1000')
+    env.setdefault('GIT_HTTP_LOW_SPEED_TIME', '10')
+    return env
+
+def _kill_process_tree(process):
+    """Kill a timed-out child and its helpers (e.g. git-remote-https)"""
+    import signal
+    if hasattr(os, 'killpg'):
+        os.killpg(process.pid, signal.SIGKILL)
+    else:
+        process.kill()
+
+def _spawn_kwargs():
+    """Popen kwargs that put each child in its own process group.
+
+    process_group on 3.11+ (cheaper than a whole new session) and
+    start_new_session before that, so a timed-out child can be killed
+    together with its helpers via os.killpg.
+    """
+    if os.name != 'posix':
+        return {}
+    if sys.version_info >= (3, 11):
+        return {'process_group': 0}
+    return {'start_new_session': True}
+
+def run_command(argv, timeout=None, env=None):
+    """Execute a command (argv list) and return the exit code"""
+    import subprocess
+    _log(f"Executing: {' '.join(argv)}")
+    sys.stderr.flush()
+    process = subprocess.Popen(argv, env=env, **_spawn_kwargs())
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_tree(process)
+        process.wait()
+        raise
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, argv)
+    return returncode
+
+async def run_command_async(argv, timeout=None, env=None):
+    """Execute a command (argv list) asynchronously and return the exit code"""
+    import asyncio
+    import subprocess
+    _log(f"Executing: {' '.join(argv)}")
+    sys.stderr.flush()
+    process = await asyncio.create_subprocess_exec(
+        *argv, env=env, **_spawn_kwargs())
+    try:
+        returncode = await asyncio.wait_for(process.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _kill_process_tree(process)
+        await process.wait()
+        raise subprocess.TimeoutExpired(argv, timeout)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, argv)
+    return returncode
 
 def delete_tag(version):
-    """Delete a tag locally and from origin"""
-    if not version.startswith('v'):
-        version = f'v{version}'
-
-    commands = [
-        f'git tag -d {version}',
-        f'git push origin --delete {version}'
-    ]
-
-    for command in commands:
-        print(f"Executing: {command}")
-        try:
-            run_command(command)
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing command: {command}")
-            print(f"Error: {e}")
-            sys.exit(1)
-
-    print(f"Successfully deleted tag {version} locally and from origin")
-
-def create_tag(version):
-    """Create and push a git tag"""
-    if not version.startswith('v'):
-        version = f'v{version}'
-
-    commands = [
-        f'git tag {version}',
-        f'git push origin {version}'
-    ]
-
-    for command in commands:
-        print(f"Executing: {command}")
-        try:
-            run_command(command)
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing command: {command}")
-            print(f"Error: {e}")
-            sys.exit(1)
-
-    print(f"Successfully created and pushed tag {version}")
-
-def build_package():
+    """Delete a tag locally and from origin.
+
+    Expects an already-normalized, v-prefixed version (see _vtag).
+    """
+    import concurrent.futures
+    import subprocess
+    # The local delete is disk-bound and the remote delete is
+    # network-bound, so run them concurrently
+    # Passing the expected old value makes update-ref fail when the
+    # tag does not exist, matching 'git tag -d' instead of silently
+    # succeeding
+    local_delete = ['git', 'update-ref', '-d', f'refs/tags/{version}', version]
+    # --delete (unlike the colon refspec) errors out when the remote
+    # tag does not exist, and is still a single push round-trip
+    remote_delete = ['git', 'push', 'origin', '--delete', version]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {
+            executor.submit(run_command, local_delete,
+                            timeout=GIT_LOCAL_TIMEOUT): local_delete,
+            executor.submit(run_command, remote_delete,
+                            timeout=GIT_PUSH_TIMEOUT, env=_git_env()): remote_delete,
+        }
+        for future, command in futures.items():
+            try:
+                future.result()
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+                _die(f"Error executing command: {' '.join(command)}\nError: {e}")
+
+    _log(f"Successfully deleted tag {version} locally and from origin")
+
+async def tag_local(version):
+    """Create a git tag locally via update-ref, skipping porcelain overhead"""
+    import subprocess
+    # The trailing empty old-value makes update-ref fail if the tag
+    # already exists, matching 'git tag' instead of clobbering it
+    command = ['git', 'update-ref', f'refs/tags/{version}', 'HEAD', '']
+    try:
+        await run_command_async(command, timeout=GIT_LOCAL_TIMEOUT)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        _die(f"Error executing command: {' '.join(command)}\nError: {e}")
+
+async def push_tag(version):
+    """Push a git tag to origin"""
+    import subprocess
+    command = ['git', 'push', '--atomic', 'origin', f'refs/tags/{version}']
+    try:
+        await run_command_async(command, timeout=GIT_PUSH_TIMEOUT, env=_git_env())
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        _die(f"Error executing command: {' '.join(command)}\nError: {e}")
+
+async def create_tag(version):
+    """Create and push a git tag.
+
+    Expects an already-normalized, v-prefixed version (see _vtag).
+    """
+    await tag_local(version)
+    await push_tag(version)
+
+    _log(f"Successfully created and pushed tag {version}")
+
+def clean_build_artifacts():
+    """Remove dist/, build/ and *.egg-info without spawning a shell"""
+    for directory in ['dist', 'build']:
+        shutil.rmtree(directory, ignore_errors=True)
+    for egg_info in pathlib.Path('.').glob('*.egg-info'):
+        shutil.rmtree(egg_info, ignore_errors=True)
+
+def _build_one(distribution, srcdir='.'):
+    """Build one distribution from srcdir into a private temp dir under dist/"""
+    import tempfile
+    from build import ProjectBuilder
+    from build.env import DefaultIsolatedEnv
+
+    outdir = tempfile.mkdtemp(prefix=f'.{distribution}-', dir='dist')
+    with DefaultIsolatedEnv() as env:
+        builder = ProjectBuilder.from_isolated_env(env, srcdir)
+        env.install(builder.build_system_requires)
+        env.install(builder.get_requires_for_build(distribution))
+        return outdir, builder.build(distribution, outdir)
+
+def _build_in_process():
+    """Build the sdist, then the wheel from it, via the build API"""
+    import tarfile
+    import tempfile
+    os.makedirs('dist', exist_ok=True)
+
+    # setuptools backends write egg-info into the source tree during
+    # both hooks, so the two builds cannot share '.' concurrently.
+    # Build the sdist first, then the wheel from the unpacked sdist,
+    # which also verifies the sdist contents the way 'python -m
+    # build' does
+    outdir, sdist = _build_one('sdist')
+    sdist_path = os.path.join('dist', os.path.basename(sdist))
+    os.replace(sdist, sdist_path)
+    shutil.rmtree(outdir, ignore_errors=True)
+
+    with tempfile.TemporaryDirectory() as unpack_dir:
+        with tarfile.open(sdist_path) as tar:
+            tar.extractall(unpack_dir)
+        (srcdir,) = pathlib.Path(unpack_dir).iterdir()
+        outdir, wheel = _build_one('wheel', str(srcdir))
+        os.replace(wheel, os.path.join('dist', os.path.basename(wheel)))
+        shutil.rmtree(outdir, ignore_errors=True)
+
+async def build_package():
     """Build the package"""
-    commands = [
-        'rm -rf dist/ build/ *.egg-info',
-        'python -m build'
-    ]
-
-    for command in commands:
-        print(f"Executing: {command}")
-        try:
-            run_command(command)
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing command: {command}")
-            print(f"Error: {e}")
-            sys.exit(1)
-
-    print("Successfully built package")
-
-def upload_package():
+    import asyncio
+    _log("Cleaning dist/, build/ and *.egg-info")
+    clean_build_artifacts()
+
+    # In-process via the build API: no extra interpreter startup,
+    # versus two PEP 517 frontend invocations from 'python -m build'
+    _log("Building sdist and wheel")
+    sys.stderr.flush()
+    try:
+        await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(None, _build_in_process),
+            timeout=BUILD_TIMEOUT)
+    except asyncio.TimeoutError:
+        _die(f"Error building package: timed out after {BUILD_TIMEOUT}s")
+    except Exception as e:
+        _die(f"Error building package: {e}")
+
+    _log("Successfully built package")
+
+async def upload_package():
     """Upload the package to PyPI"""
-    command = 'twine upload dist/*'
-    print(f"Executing: {command}")
+    import asyncio
+    import subprocess
+    files = sorted(glob.glob('dist/*'))
+    if not files:
+        _die("No distribution files found in dist/")
+
+    # Uploads of distinct files are network-bound and independent, so
+    # run one twine process per file with bounded concurrency
+    semaphore = asyncio.Semaphore(min(4, len(files)))
+
+    async def upload_one(path):
+        async with semaphore:
+            await run_command_async(['twine', 'upload', path],
+                                    timeout=UPLOAD_TIMEOUT)
+
+    # Parallel twine processes would each prompt for credentials on
+    # the same terminal and garble stdin, so only fan out when the
+    # credentials come from the environment or ~/.pypirc
+    has_credentials = (
+        any(os.environ.get(name) for name in
+            ('TWINE_USERNAME', 'TWINE_PASSWORD', 'TWINE_API_KEY'))
+        or pathlib.Path('~/.pypirc').expanduser().exists())
+
     try:
-        run_command(command)
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing command: {command}")
-        print(f"Error: {e}")
-        sys.exit(1)
+        if len(files) == 1 or (sys.stdin.isatty() and not has_credentials):
+            await run_command_async(['twine', 'upload'] + files,
+                                    timeout=UPLOAD_TIMEOUT)
+        else:
+            await asyncio.gather(*(upload_one(path) for path in files))
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        _die(f"Error uploading to PyPI: {e}")
 
-    print("Successfully uploaded package to PyPI")
+    _log("Successfully uploaded package to PyPI")
 
 def init_github_repo(repo_name=None, private=False):
     """Initialize git repo and create GitHub repository"""
-    import os
+    import subprocess
 
     # Get repo name from current directory if not provided
     if repo_name is None:
         repo_name = os.path.basename(os.getcwd())
 
-    # Check if git repo exists
-    try:
-        subprocess.run(['git', 'status'], capture_output=True, check=True)
-        print("Git repository already exists")
-    except subprocess.CalledProcessError:
-        # Initialize git repo
-        print("Initializing git repository...")
-        run_command('git init')
-        run_command('git add .')
-        run_command('git commit -m "Initial commit"')
+    # Check if git repo exists; .git may be a directory or, for
+    # worktrees, a gitfile -- a single stat covers both
+    if pathlib.Path('.git').exists():
+        _log("Git repository already exists")
+    else:
+        # Initialize git repo: one shell process runs all three local
+        # git ops, amortizing fork+exec across them
+        _log("Initializing git repository...")
+        command = 'git init && git add . && git commit -m "Initial commit"'
+        _log(f"Executing: {command}")
+        sys.stderr.flush()
+        subprocess.run(command, shell=True, check=True,
+                       timeout=3 * GIT_LOCAL_TIMEOUT)
 
     # Create GitHub repo and push
     visibility = '--private' if private else '--public'
-    command = f'gh repo create {repo_name} {visibility} --source=. --remote=origin --push'
-    print(f"Executing: {command}")
+    command = ['gh', 'repo', 'create', repo_name, visibility,
+               '--source=.', '--remote=origin', '--push']
     try:
-        run_command(command)
-        print(f"Successfully created GitHub repository: {repo_name}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error creating GitHub repository: {e}")
-        sys.exit(1)
+        run_command(command, timeout=GIT_PUSH_TIMEOUT, env=_git_env())
+        _log(f"Successfully created GitHub repository: {repo_name}")
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        _die(f"Error creating GitHub repository: {e}")
 
-def publish_version(version, tag_only=False, build_only=False, no_build=False, no_upload=False):
-    """Publish a new version with configurable steps"""
-    if not version.startswith('v'):
-        version = f'v{version}'
+async def publish_version_async(version, tag_only=False, build_only=False, no_build=False, no_upload=False):
+    """Publish a new version with configurable steps.
 
-    # Create and push tag
-    create_tag(version)
+    Expects an already-normalized, v-prefixed version (see _vtag);
+    main() normalizes once before dispatch.
+    """
+    import asyncio
+    # The tag must exist locally before anything else; it is fast
+    await tag_local(version)
 
     if tag_only:
+        await push_tag(version)
+        _log(f"Successfully created and pushed tag {version}")
         return
 
-    # Build package
+    # The push is network-bound and the build is local, so overlap them
+    steps = [push_tag(version)]
     if not no_build:
-        build_package()
+        steps.append(build_package())
+    await asyncio.gather(*steps)
 
     if build_only or no_upload:
         return
 
     # Upload to PyPI
-    upload_package()
+    await upload_package()
 
-    print(f"Successfully published version {version}")
+    _log(f"Successfully published version {version}")
 
-def main():
+def publish_version(version, tag_only=False, build_only=False, no_build=False, no_upload=False):
+    """Publish a new version (synchronous entry point)"""
+    import asyncio
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    asyncio.run(publish_version_async(
+        version,
+        tag_only=tag_only,
+        build_only=build_only,
+        no_build=no_build,
+        no_upload=no_upload
+    ))
+
+# Presence flags understood by the hand-rolled dispatcher in main()
+_FLAGS = {'--init-repo', '--private', '--delete-tag', '--tag-only',
+          '--build-only', '--no-build', '--no-upload'}
+
+def _print_help():
+    """Build the full argparse parser only when help is actually wanted"""
+    import argparse
     parser = argparse.ArgumentParser(
         description='Publish or delete package versions',
         epilog='''
@@ -169,24 +387,47 @@ Examples:
                         help='Skip build step (use existing dist/)')
     parser.add_argument('--no-upload', action='store_true',
                         help='Skip upload step (same as --build-only)')
+    parser.print_help()
+
+def _usage_error(message):
+    """Report a usage error on stderr and exit like argparse would"""
+    prog = os.path.basename(sys.argv[0])
+    _log(f"{prog}: error: {message} (see --help)")
+    sys.exit(2)
+
+def main():
+    argv = sys.argv[1:]
+    if '-h' in argv or '--help' in argv:
+        _print_help()
+        return
 
-    args = parser.parse_args()
+    flags = set()
+    version = None
+    for arg in argv:
+        if arg in _FLAGS:
+            flags.add(arg)
+        elif arg.startswith('-'):
+            _usage_error(f"unrecognized argument: {arg}")
+        elif version is None:
+            version = arg
+        else:
+            _usage_error(f"unexpected argument: {arg}")
 
-    if args.init_repo:
-        init_github_repo(repo_name=args.version, private=args.private)
-    elif args.delete_tag:
-        if not args.version:
-            parser.error('version is required for --delete-tag')
-        delete_tag(args.version)
+    if '--init-repo' in flags:
+        init_github_repo(repo_name=version, private='--private' in flags)
+    elif '--delete-tag' in flags:
+        if not version:
+            _usage_error('version is required for --delete-tag')
+        delete_tag(_vtag(version))
     else:
-        if not args.version:
-            parser.error('version is required')
+        if not version:
+            _usage_error('version is required')
         publish_version(
-            args.version,
-            tag_only=args.tag_only,
-            build_only=args.build_only,
-            no_build=args.no_build,
-            no_upload=args.no_upload
+            _vtag(version),
+            tag_only='--tag-only' in flags,
+            build_only='--build-only' in flags,
+            no_build='--no-build' in flags,
+            no_upload='--no-upload' in flags
         )
 
 if __name__ == "__main__":